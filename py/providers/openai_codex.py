@@ -1,33 +1,250 @@
 from collections.abc import Iterator, Mapping, Sequence
-from typing import Any
+from typing import Any, TYPE_CHECKING
+import io
+import socket
+import urllib.error
 import urllib.request
-import os
+import re
 import json
+import time
+import zlib
 import vim
 
-if "VIMAI_DUMMY_IMPORT" in os.environ:
+try:
+    # optional: keep-alive connection pooling, reuses the TLS session across requests
+    import urllib3
+except ImportError:
+    urllib3 = None
+
+try:
+    # optional: faster JSON codec for the request body and per-chunk parsing
+    import orjson
+
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    _json_loads = json.loads
+
+try:
+    # optional: SIMD-accelerated parser, materializes only the extracted field
+    import simdjson
+    _simd_parser = simdjson.Parser()
+except ImportError:
+    _simd_parser = None
+
+if TYPE_CHECKING:
     from py.types import AIMessage, AIResponseChunk, AIImageResponseChunk, AIUtils, AIProvider, AICommandType
 
+_http_pool = None
+
+def _get_http_pool():
+    global _http_pool
+    if _http_pool is None:
+        _http_pool = urllib3.PoolManager(maxsize=4, retries=False)
+    return _http_pool
+
+_VARNAME_BY_COMMAND = {
+    "complete": "g:vim_ai_openai_codex_complete",
+    "edit": "g:vim_ai_openai_codex_edit",
+}
+
+_ROLE_LABELS = {
+    "system": "System",
+    "user": "User",
+    "assistant": "Assistant",
+    "tool": "Tool",
+}
+
+_CODEX_OPTION_KEYS = (
+    "suffix",
+    "max_tokens",
+    "temperature",
+    "top_p",
+    "n",
+    "stream",
+    "logprobs",
+    "stop",
+    "presence_penalty",
+    "frequency_penalty",
+    "best_of",
+    "logit_bias",
+)
+
+# keys whose 0 value means "exclude from the request"
+_ZERO_SKIP_KEYS = frozenset(("max_tokens", "logprobs", "best_of", "n"))
+
+# request key -> whether a 0 value excludes it, for a single-lookup filter
+_CODEX_KEY_SPECS = {key: key in _ZERO_SKIP_KEYS for key in _CODEX_OPTION_KEYS}
+
+# how long a loaded api key is reused before the token file / load
+# function is consulted again
+_API_KEY_TTL_SECONDS = 300
+
+_BASE_HEADERS = {
+    "Content-Type": "application/json",
+    "User-Agent": "VimAI",
+    # SSE payloads are repetitive JSON, so compression cuts bytes-over-wire
+    # severalfold; urllib3 decompresses transparently, the stdlib fallback
+    # decodes via _decode_chunks
+    "Accept-Encoding": "gzip, deflate",
+}
+
+def _parse_bool(value: str) -> bool:
+    return bool(int(value))
+
+_OPTION_CONVERTERS = (
+    ("request_timeout", float),
+    ("temperature", float),
+    ("max_tokens", int),
+    ("top_p", float),
+    ("presence_penalty", float),
+    ("frequency_penalty", float),
+    ("best_of", int),
+    ("n", int),
+    ("stream", _parse_bool),
+    ("logprobs", int),
+    ("suffix", str),
+    ("stop", _json_loads),
+    ("logit_bias", _json_loads),
+)
+
+_SSE_LINE_RE = re.compile(rb"data: (.*?)\r?$")
+_SSE_DONE = b"[DONE]"
+
+def _iter_sse_events(chunks: Iterator[bytes]) -> Iterator[Mapping[str, Any]]:
+    # byte-level SSE framing: scan the raw buffer for line boundaries and hand
+    # the payload slice straight to json.loads (bytes are accepted since 3.6),
+    # avoiding a full str decode per event
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", start)
+            if newline == -1:
+                break
+            # match against the buffer in place - non-data lines are
+            # rejected in a single scan without slicing a line copy out
+            match = _SSE_LINE_RE.match(buffer, start, newline)
+            start = newline + 1
+            if match is None:
+                continue
+            payload = match.group(1)
+            if payload.rstrip() == _SSE_DONE:
+                continue
+            if _simd_parser is not None:
+                doc = _simd_parser.parse(payload)
+                try:
+                    # LookupError covers both a missing key and an empty
+                    # choices array (IndexError)
+                    text = str(doc.at_pointer("/choices/0/text"))
+                except (LookupError, TypeError, ValueError):
+                    text = ""
+                # the document must be released before the next parse() -
+                # the parser refuses to be reused while it is alive, and the
+                # generator frame would otherwise keep it across iterations
+                del doc
+                yield {"choices": [{"text": text}]}
+                continue
+            yield _json_loads(payload)
+        del buffer[:start]
+
+def _py_messages_to_prompt(messages: "Sequence[AIMessage]") -> str:
+    last_role: str | None = None
+
+    def _parts() -> Iterator[str]:
+        nonlocal last_role
+        for message in messages:
+            content = message.get("content") or ()
+            text = "\n".join(
+                c["text"] for c in content if c.get("type") == "text" and c.get("text")
+            ).strip()
+            if not text:
+                continue
+            role = _ROLE_LABELS.get(message.get("role", "user"), "User")
+            last_role = role
+            yield f"{role}::\n{text}"
+
+    prompt = "\n\n".join(_parts())
+    if last_role == "Assistant":
+        return prompt
+    return f"{prompt}\n\nAssistant::" if prompt else "Assistant::"
+
+try:
+    # optional: AOT-compiled (mypyc/Cython) prompt builder - a module named
+    # vim_ai_codex_prompt exposing messages_to_prompt(messages) -> str on the
+    # embedded interpreter's path takes precedence over the pure-Python
+    # implementation above
+    from vim_ai_codex_prompt import messages_to_prompt as _messages_to_prompt
+except ImportError:
+    _messages_to_prompt = _py_messages_to_prompt
+
+def _decode_chunks(chunks: Iterator[bytes], encoding: str) -> Iterator[bytes]:
+    if encoding == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        decompressor = zlib.decompressobj()
+    else:
+        yield from chunks
+        return
+    for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
 
 class OpenAICodexProvider:
-    default_options_varname_complete = "g:vim_ai_openai_codex_complete"
-    default_options_varname_edit = "g:vim_ai_openai_codex_edit"
+    # (raw copy, parsed) default options per config varname - vim.eval still
+    # runs on every construction so mid-session edits to the
+    # g:vim_ai_openai_codex_* dicts take effect; only the type-conversion
+    # pass is skipped while the raw dict is unchanged
+    _parsed_defaults_cache: dict[str, tuple[dict[str, Any], dict[str, Any]]] = {}
+
+    # loaded (api key, org id) per token source - a fresh provider is
+    # constructed for every command invocation, so the memoization must
+    # outlive the instance to actually skip the disk/Vim round-trip;
+    # entries refresh after _API_KEY_TTL_SECONDS
+    _api_key_cache: dict[tuple[str, str], tuple[float, str, str | None]] = {}
+
+    # prebuilt request headers per auth configuration, validated against the
+    # identity of the api key cache entry so a refreshed key rebuilds them
+    _headers_cache: dict[tuple[str, str, str], tuple[tuple[float, str, str | None], dict[str, str]]] = {}
 
     def __init__(self, command_type: "AICommandType", raw_options: Mapping[str, str], utils: "AIUtils") -> None:
         self.utils = utils
         self.command_type = command_type
-        config_varname = getattr(self, f"default_options_varname_{command_type}", "")
+        config_varname = _VARNAME_BY_COMMAND.get(command_type, "")
         raw_default_options = vim.eval(config_varname) if config_varname else {}
-        merged_options = {**raw_default_options, **raw_options}
-        self.options = self._parse_raw_options(merged_options)
+        cached = self._parsed_defaults_cache.get(config_varname)
+        if cached is not None and cached[0] == raw_default_options:
+            parsed_defaults = cached[1]
+        else:
+            parsed_defaults = self._parse_raw_options(raw_default_options)
+            if config_varname:
+                self._parsed_defaults_cache[config_varname] = (dict(raw_default_options), parsed_defaults)
+        self.options = {**parsed_defaults, **self._parse_raw_options(dict(raw_options))}
         self._ensure_supported_command()
+        # options are immutable after __init__, so the filtered request
+        # options can be computed once instead of on every request()
+        self._codex_options = self._make_codex_options(self.options)
+        if urllib3 is not None:
+            # construct the shared pool up front so the first request only
+            # pays for the TCP+TLS handshake, not pool setup; subsequent
+            # requests reuse the kept-alive connection entirely
+            _get_http_pool()
 
     def _ensure_supported_command(self) -> None:
         if self.command_type not in ("complete", "edit"):
             raise self.utils.make_known_error("OpenAI Codex provider supports only :AI and :AIEdit commands")
 
     def request(self, messages: "Sequence[AIMessage]") -> Iterator["AIResponseChunk"]:
-        prompt = self._messages_to_prompt(messages)
+        prompt = _messages_to_prompt(messages)
         options = self.options
         http_options = {
             "request_timeout": options.get("request_timeout") or 20,
@@ -35,76 +252,48 @@ class OpenAICodexProvider:
             "token_file_path": options["token_file_path"],
             "token_load_fn": options["token_load_fn"],
         }
-        openai_options = self._make_codex_options(options)
+        openai_options = self._codex_options
         request = {"prompt": prompt, **openai_options}
 
         self.utils.print_debug("openai-codex: [{}] request: {}", self.command_type, request)
         url = options["endpoint_url"]
         response = self._openai_request(url, request, http_options)
 
-        def _map_chunk(resp: Mapping[str, Any]) -> "AIResponseChunk | None":
-            self.utils.print_debug("openai-codex: [{}] response: {}", self.command_type, resp)
-            choices = resp.get("choices") or [{}]
-            text = choices[0].get("text", "")
-            if text:
-                return {"type": "assistant", "content": text}
-            return None
+        # single fused generator with hoisted locals instead of a
+        # filter(None, map(...)) pipeline - one frame per chunk, no
+        # per-chunk attribute lookups
+        debug = self.utils.print_debug
+        command_type = self.command_type
+
+        def _chunks() -> Iterator["AIResponseChunk"]:
+            for resp in response:
+                debug("openai-codex: [{}] response: {}", command_type, resp)
+                choices = resp.get("choices")
+                if not choices:
+                    continue
+                text = choices[0].get("text")
+                if text:
+                    yield {"type": "assistant", "content": text}
 
-        return filter(None, map(_map_chunk, response))
+        return _chunks()
 
     def request_image(self, prompt: str) -> list["AIImageResponseChunk"]:
         raise self.utils.make_known_error("OpenAI Codex provider does not support image generation")
 
-    # -- prompt helpers -------------------------------------------------
-
-    @staticmethod
-    def _messages_to_prompt(messages: "Sequence[AIMessage]") -> str:
-        role_labels = {
-            "system": "System",
-            "user": "User",
-            "assistant": "Assistant",
-            "tool": "Tool",
-        }
-        prompt_parts: list[str] = []
-        for message in messages:
-            text_chunks = [c.get("text", "") for c in message.get("content", []) if c.get("type") == "text"]
-            text = "\n".join(filter(None, text_chunks)).strip()
-            if not text:
-                continue
-            role = role_labels.get(message.get("role", "user"), "User")
-            prompt_parts.append(f"{role}::\n{text}")
-        if not prompt_parts or not prompt_parts[-1].startswith("Assistant::"):
-            prompt_parts.append("Assistant::")
-        return "\n\n".join(prompt_parts)
-
     # -- option helpers -------------------------------------------------
 
     def _parse_raw_options(self, raw_options: Mapping[str, Any]) -> dict[str, Any]:
         options = dict(raw_options)
-
-        def _convert_option(name: str, converter) -> None:
-            if name in options and isinstance(options[name], str) and options[name] != "":
-                try:
-                    options[name] = converter(options[name])
-                except (ValueError, TypeError, json.JSONDecodeError) as error:
-                    raise self.utils.make_known_error(
-                        f"Invalid value for option '{name}': {options[name]}. Error: {error}"
-                    )
-
-        _convert_option("request_timeout", float)
-        _convert_option("temperature", float)
-        _convert_option("max_tokens", int)
-        _convert_option("top_p", float)
-        _convert_option("presence_penalty", float)
-        _convert_option("frequency_penalty", float)
-        _convert_option("best_of", int)
-        _convert_option("n", int)
-        _convert_option("stream", lambda x: bool(int(x)))
-        _convert_option("logprobs", int)
-        _convert_option("suffix", str)
-        _convert_option("stop", json.loads)
-        _convert_option("logit_bias", json.loads)
-
+        for name, converter in _OPTION_CONVERTERS:
+            value = options.get(name)
+            if type(value) is not str or value == "":
+                continue
+            try:
+                options[name] = converter(value)
+            except (ValueError, TypeError, json.JSONDecodeError) as error:
+                raise self.utils.make_known_error(
+                    f"Invalid value for option '{name}': {value}. Error: {error}"
+                )
         return options
 
     def _make_codex_options(self, options: Mapping[str, Any]) -> dict[str, Any]:
@@ -112,28 +301,14 @@ class OpenAICodexProvider:
             "model": options["model"],
         }
 
-        option_keys = [
-            "suffix",
-            "max_tokens",
-            "temperature",
-            "top_p",
-            "n",
-            "stream",
-            "logprobs",
-            "stop",
-            "presence_penalty",
-            "frequency_penalty",
-            "best_of",
-            "logit_bias",
-        ]
-
-        for key in option_keys:
-            if key not in options:
+        specs = _CODEX_KEY_SPECS
+        for key, value in options.items():
+            skip_zero = specs.get(key)
+            if skip_zero is None:
                 continue
-            value = options[key]
-            if value in ("", None):
+            if value is None or value == "":
                 continue
-            if key in {"max_tokens", "logprobs", "best_of", "n"} and value == 0:
+            if skip_zero and value == 0:
                 continue
             result[key] = value
 
@@ -142,52 +317,106 @@ class OpenAICodexProvider:
     # -- HTTP helpers ---------------------------------------------------
 
     def _load_api_key(self) -> tuple[str, str | None]:
+        token_file_path = self.options.get("token_file_path", "")
+        token_load_fn = self.options.get("token_load_fn", "")
+        cache_key = (token_file_path, token_load_fn)
+        cached = self._api_key_cache.get(cache_key)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < _API_KEY_TTL_SECONDS:
+            return cached[1], cached[2]
         raw_api_key = self.utils.load_api_key(
             "OPENAI_API_KEY",
-            token_file_path=self.options.get("token_file_path", ""),
-            token_load_fn=self.options.get("token_load_fn", ""),
+            token_file_path=token_file_path,
+            token_load_fn=token_load_fn,
         )
-        elements = raw_api_key.strip().split(",")
-        api_key = elements[0].strip()
-        org_id = elements[1].strip() if len(elements) > 1 else None
+        # the raw value is "<api key>[,<org id>]"
+        api_key, _, org_id = raw_api_key.strip().partition(",")
+        api_key = api_key.strip()
+        org_id = org_id.strip() or None
+        self._api_key_cache[cache_key] = (now, api_key, org_id)
         return api_key, org_id
 
-    def _openai_request(self, url: str, data: Mapping[str, Any], options: Mapping[str, Any]) -> Iterator[Mapping[str, Any]]:
-        resp_data_prefix = "data: "
-        resp_done = "[DONE]"
-
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": "VimAI",
-        }
-
-        auth_type = options["auth_type"]
+    def _request_headers(self, auth_type: str) -> dict[str, str]:
+        if auth_type not in ("bearer", "api-key"):
+            return _BASE_HEADERS
+        api_key, org_id = self._load_api_key()
+        token_file_path = self.options.get("token_file_path", "")
+        token_load_fn = self.options.get("token_load_fn", "")
+        key_entry = self._api_key_cache[(token_file_path, token_load_fn)]
+        cache_key = (auth_type, token_file_path, token_load_fn)
+        cached = self._headers_cache.get(cache_key)
+        # rebuild only when the memoized api key was refreshed
+        if cached is not None and cached[0] is key_entry:
+            return cached[1]
+        headers = dict(_BASE_HEADERS)
         if auth_type == "bearer":
-            api_key, org_id = self._load_api_key()
             headers["Authorization"] = f"Bearer {api_key}"
             if org_id:
                 headers["OpenAI-Organization"] = org_id
-        elif auth_type == "api-key":
-            api_key, _ = self._load_api_key()
+        else:
             headers["api-key"] = api_key
+        self._headers_cache[cache_key] = (key_entry, headers)
+        return headers
 
+    def _openai_request(self, url: str, data: Mapping[str, Any], options: Mapping[str, Any]) -> Iterator[Mapping[str, Any]]:
+        headers = self._request_headers(options["auth_type"])
         request_timeout = options.get("request_timeout", 20)
+        # NOTE: _json_dumps produces the final bytes body in one allocation and
+        # both transports send it as-is; a reusable scratch buffer would only
+        # add a copy here (orjson has no encode-into-buffer API)
+        body = _json_dumps(data)
+        stream = bool(data.get("stream"))
+
+        if urllib3 is not None:
+            # urllib3 does not raise on status and uses its own transport
+            # exceptions; translate both into the urllib.error types that
+            # handle_completion_error in utils.py reports on
+            try:
+                response = _get_http_pool().request(
+                    "POST",
+                    url,
+                    body=body,
+                    headers=headers,
+                    preload_content=not stream,
+                    timeout=request_timeout,
+                )
+                try:
+                    if response.status >= 400:
+                        raise urllib.error.HTTPError(
+                            url,
+                            response.status,
+                            response.reason,
+                            response.headers,
+                            io.BytesIO(response.data),
+                        )
+                    if not stream:
+                        yield _json_loads(response.data)
+                        return
+                    yield from _iter_sse_events(response.stream(decode_content=True))
+                finally:
+                    response.release_conn()
+            except urllib3.exceptions.TimeoutError as error:
+                raise urllib.error.URLError(socket.timeout()) from error
+            except urllib3.exceptions.HTTPError as error:
+                raise urllib.error.URLError(error) from error
+            return
+
+        # fallback: one connection per request when urllib3 is not available
         req = urllib.request.Request(
             url,
-            data=json.dumps(data).encode("utf-8"),
+            data=body,
             headers=headers,
             method="POST",
         )
 
         with urllib.request.urlopen(req, timeout=request_timeout) as response:
-            if not data.get("stream"):
-                yield json.loads(response.read().decode())
+            encoding = response.headers.get("Content-Encoding", "")
+            if not stream:
+                raw = response.read()
+                if encoding in ("gzip", "deflate"):
+                    wbits = 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS
+                    raw = zlib.decompress(raw, wbits)
+                yield _json_loads(raw)
                 return
-            for line_bytes in response:
-                line = line_bytes.decode("utf-8", errors="replace")
-                if not line.startswith(resp_data_prefix):
-                    continue
-                payload = line[len(resp_data_prefix):].strip()
-                if payload == resp_done:
-                    continue
-                yield json.loads(payload)
+            chunks = iter(lambda: response.read1(8192), b"")
+            yield from _iter_sse_events(_decode_chunks(chunks, encoding))
@@ -1,5 +1,13 @@
+import gzip
+import json
+import socket
+import urllib.error
+import zlib
+
 import pytest
+import urllib3
 
+import providers.openai_codex as openai_codex
 from providers.openai_codex import OpenAICodexProvider
 
 
@@ -14,6 +22,35 @@ class DummyUtils:
         return "test-key"
 
 
+class FakePoolResponse:
+    def __init__(self, status=200, reason="OK", data=b"", chunks=()):
+        self.status = status
+        self.reason = reason
+        self.headers = {}
+        self.data = data
+        self._chunks = chunks
+        self.released = False
+
+    def stream(self, decode_content=True):
+        yield from self._chunks
+
+    def release_conn(self):
+        self.released = True
+
+
+class FakePoolManager:
+    def __init__(self, response=None, error=None):
+        self.response = response
+        self.error = error
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
 def _make_messages():
     return [
         {
@@ -52,3 +89,239 @@ def test_codex_provider_rejects_chat():
     utils = DummyUtils()
     with pytest.raises(RuntimeError):
         OpenAICodexProvider("chat", {}, utils)
+
+
+def test_default_options_follow_vim_config_changes(monkeypatch):
+    utils = DummyUtils()
+    first = OpenAICodexProvider("complete", {}, utils)
+    assert first.options["temperature"] == 0.2
+
+    changed = dict(openai_codex.vim._CODEX_DEFAULTS, temperature="0.9")
+    monkeypatch.setattr(openai_codex.vim, "eval", lambda cmd: dict(changed))
+
+    second = OpenAICodexProvider("complete", {}, utils)
+    assert second.options["temperature"] == 0.9
+
+
+def test_api_key_cached_across_provider_instances():
+    class CountingUtils(DummyUtils):
+        def __init__(self):
+            self.load_calls = 0
+
+        def load_api_key(self, env_variable, token_file_path="", token_load_fn=""):
+            self.load_calls += 1
+            return "test-key,test-org"
+
+    utils = CountingUtils()
+    options = {"token_file_path": "counting.token"}
+
+    first = OpenAICodexProvider("complete", options, utils)
+    assert first._load_api_key() == ("test-key", "test-org")
+    second = OpenAICodexProvider("complete", options, utils)
+    assert second._load_api_key() == ("test-key", "test-org")
+
+    assert utils.load_calls == 1
+
+
+def test_request_headers_cached_until_key_refresh():
+    utils = DummyUtils()
+    options = {"token_file_path": "headers.token"}
+
+    first = OpenAICodexProvider("complete", options, utils)
+    headers = first._request_headers("bearer")
+    assert headers["Authorization"] == "Bearer test-key"
+
+    second = OpenAICodexProvider("complete", options, utils)
+    assert second._request_headers("bearer") is headers
+
+    # expire the cached key - the refreshed entry must rebuild the headers
+    OpenAICodexProvider._api_key_cache[("headers.token", "")] = (float("-inf"), "stale", None)
+    refreshed = second._request_headers("bearer")
+    assert refreshed is not headers
+    assert refreshed["Authorization"] == "Bearer test-key"
+
+
+def test_iter_sse_events_splits_event_across_chunks():
+    chunks = [b'data: {"choices": [{"te', b'xt": "hi"}]}\n']
+
+    events = list(openai_codex._iter_sse_events(iter(chunks)))
+
+    assert events == [{"choices": [{"text": "hi"}]}]
+
+
+def test_iter_sse_events_handles_crlf_lines():
+    chunks = [b'data: {"choices": [{"text": "a"}]}\r\n\r\ndata: {"choices": [{"text": "b"}]}\r\n']
+
+    events = list(openai_codex._iter_sse_events(iter(chunks)))
+
+    assert events == [{"choices": [{"text": "a"}]}, {"choices": [{"text": "b"}]}]
+
+
+def test_iter_sse_events_skips_non_data_lines():
+    chunks = [b': keepalive\nevent: completion\ndata: {"choices": [{"text": "hi"}]}\n\n']
+
+    events = list(openai_codex._iter_sse_events(iter(chunks)))
+
+    assert events == [{"choices": [{"text": "hi"}]}]
+
+
+def test_iter_sse_events_ignores_done_with_trailing_whitespace():
+    chunks = [b'data: {"choices": [{"text": "hi"}]}\ndata: [DONE] \t\n']
+
+    events = list(openai_codex._iter_sse_events(iter(chunks)))
+
+    assert events == [{"choices": [{"text": "hi"}]}]
+
+
+def test_iter_sse_events_drops_partial_trailing_line():
+    chunks = [b'data: {"choices": [{"text": "hi"}]}\ndata: {"choices": [{"te']
+
+    events = list(openai_codex._iter_sse_events(iter(chunks)))
+
+    assert events == [{"choices": [{"text": "hi"}]}]
+
+
+@pytest.mark.skipif(openai_codex._simd_parser is None, reason="pysimdjson not installed")
+def test_iter_sse_events_simdjson_extraction():
+    chunks = [
+        b'data: {"choices": [{"text": "a"}]}\n'
+        b'data: {"choices": [{"text": "b"}]}\n'
+        b'data: {"choices": []}\n'
+        b'data: {"no_choices": true}\n'
+    ]
+
+    events = list(openai_codex._iter_sse_events(iter(chunks)))
+
+    assert events == [
+        {"choices": [{"text": "a"}]},
+        {"choices": [{"text": "b"}]},
+        {"choices": [{"text": ""}]},
+        {"choices": [{"text": ""}]},
+    ]
+
+
+def test_decode_chunks_gzip_split_mid_stream():
+    data = b'data: {"choices": [{"text": "hi"}]}\n'
+    compressed = gzip.compress(data)
+    chunks = [compressed[:7], compressed[7:]]
+
+    assert b"".join(openai_codex._decode_chunks(iter(chunks), "gzip")) == data
+
+
+def test_decode_chunks_deflate():
+    data = b'data: {"choices": [{"text": "hi"}]}\n'
+    compressed = zlib.compress(data)
+
+    assert b"".join(openai_codex._decode_chunks(iter([compressed]), "deflate")) == data
+
+
+def test_decode_chunks_passes_through_uncompressed():
+    data = b'data: {"choices": [{"text": "hi"}]}\n'
+
+    assert b"".join(openai_codex._decode_chunks(iter([data]), "")) == data
+
+
+class FakeUrlopenResponse:
+    def __init__(self, body, encoding=""):
+        self._body = body
+        self.headers = {"Content-Encoding": encoding} if encoding else {}
+
+    def read(self):
+        return self._body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+@pytest.mark.parametrize("encoding,compress", [
+    ("gzip", gzip.compress),
+    ("deflate", zlib.compress),
+])
+def test_non_streaming_compressed_body_in_stdlib_fallback(monkeypatch, encoding, compress):
+    provider = OpenAICodexProvider("complete", {}, DummyUtils())
+    body = compress(json.dumps({"choices": [{"text": "hi"}]}).encode())
+    monkeypatch.setattr(openai_codex, "urllib3", None)
+    monkeypatch.setattr(
+        openai_codex.urllib.request,
+        "urlopen",
+        lambda req, timeout: FakeUrlopenResponse(body, encoding),
+    )
+
+    result = list(provider._openai_request(
+        "https://api.openai.com/v1/completions",
+        {"prompt": "Say hi"},
+        _http_options(),
+    ))
+
+    assert result == [{"choices": [{"text": "hi"}]}]
+
+
+def _http_options():
+    return {
+        "request_timeout": 5,
+        "auth_type": "bearer",
+        "token_file_path": "",
+        "token_load_fn": "",
+    }
+
+
+def test_openai_request_streams_via_pool(monkeypatch):
+    provider = OpenAICodexProvider("complete", {}, DummyUtils())
+    chunks = (
+        b'data: {"choices": [{"text": "Hel"}]}\n',
+        b'data: {"choices": [{"text": "lo"}]}\n\ndata: [DONE]\n',
+    )
+    response = FakePoolResponse(chunks=chunks)
+    pool = FakePoolManager(response=response)
+    monkeypatch.setattr(openai_codex, "_http_pool", pool)
+
+    result = list(provider._openai_request(
+        "https://api.openai.com/v1/completions",
+        {"prompt": "Say hi", "stream": True},
+        _http_options(),
+    ))
+
+    assert result == [{"choices": [{"text": "Hel"}]}, {"choices": [{"text": "lo"}]}]
+    method, url, kwargs = pool.calls[0]
+    assert method == "POST"
+    assert url == "https://api.openai.com/v1/completions"
+    assert kwargs["headers"]["Authorization"] == "Bearer test-key"
+    assert kwargs["preload_content"] is False
+    assert response.released
+
+
+def test_openai_request_raises_http_error_with_body(monkeypatch):
+    provider = OpenAICodexProvider("complete", {}, DummyUtils())
+    body = json.dumps({"error": {"message": "Incorrect API key provided"}}).encode()
+    response = FakePoolResponse(status=401, reason="Unauthorized", data=body)
+    monkeypatch.setattr(openai_codex, "_http_pool", FakePoolManager(response=response))
+
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        list(provider._openai_request(
+            "https://api.openai.com/v1/completions",
+            {"prompt": "Say hi", "stream": True},
+            _http_options(),
+        ))
+
+    assert excinfo.value.getcode() == 401
+    parsed = json.loads(excinfo.value.read().decode())
+    assert parsed["error"]["message"] == "Incorrect API key provided"
+    assert response.released
+
+
+def test_openai_request_maps_timeout_to_urlerror(monkeypatch):
+    provider = OpenAICodexProvider("complete", {}, DummyUtils())
+    error = urllib3.exceptions.ReadTimeoutError(None, "url", "Read timed out.")
+    monkeypatch.setattr(openai_codex, "_http_pool", FakePoolManager(error=error))
+
+    with pytest.raises(urllib.error.URLError) as excinfo:
+        list(provider._openai_request(
+            "https://api.openai.com/v1/completions",
+            {"prompt": "Say hi", "stream": True},
+            _http_options(),
+        ))
+
+    assert isinstance(excinfo.value.reason, socket.timeout)